@@ -1,15 +1,22 @@
+import asyncio
 import logging
-from passlib.context import CryptContext
-from datetime import datetime, timedelta
-from typing import Annotated, Optional
-from jose import JWTError, jwt
-from fastapi import Depends, HTTPException, status
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from argon2 import PasswordHasher, Type
+from argon2.exceptions import InvalidHashError, VerifyMismatchError
+from datetime import timedelta
+from typing import Optional
+import jwt
+from fastapi import HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from pydantic_settings import BaseSettings
 
 # Set up logging for this module
 logger = logging.getLogger("auth_utils")
-logger.setLevel(logging.DEBUG) # Set to DEBUG for detailed tracking of token lifecycle
+logger.setLevel(logging.INFO) # Switch to DEBUG locally for detailed tracking of token lifecycle
 
 # --- Configuration: Reads from environment (docker-compose) ---
 class AuthSettings(BaseSettings):
@@ -17,14 +24,55 @@ class AuthSettings(BaseSettings):
     SECRET_KEY: str = "please-change-this-to-a-long-random-string-in-next-sprint" # Default fallback
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 10080 # 7 days expiration default
+    # Argon2id cost parameters (OWASP baseline profile: m=46 MiB, t=1, p=1)
+    ARGON2_MEMORY_COST: int = 47104 # KiB
+    ARGON2_TIME_COST: int = 1
+    ARGON2_PARALLELISM: int = 1 # Concurrency comes from the process pool, not per-hash lanes
+    # Number of uvicorn worker processes; each one builds its own hashing pool
+    WEB_CONCURRENCY: int = 1
+    # Hashing processes per uvicorn worker. When unset, the cores are split across workers.
+    ARGON2_POOL_WORKERS: Optional[int] = None
         
 auth_settings = AuthSettings()
 logger.info("Auth settings loaded successfully.")
 
+# JWT signing material is derived once at import instead of on every encode/decode
+JWT_SIGNING_KEY = auth_settings.SECRET_KEY.encode()
+JWT_ALGORITHM = auth_settings.ALGORITHM
+JWT_ALGORITHMS = [auth_settings.ALGORITHM]
+_access_token_expire_seconds = auth_settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+
 # Configuration for Argon2
 # Argon2 is the recommended modern hashing scheme and handles long passwords without byte limits.
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
-logger.debug("Password CryptContext initialized with Argon2.")
+# Cost parameters are pinned explicitly rather than relying on library defaults;
+# raise them only as far as the login-latency budget allows.
+# argon2-cffi is used directly (no passlib wrapper) to avoid scheme dispatch on every call.
+ph = PasswordHasher(
+    time_cost=auth_settings.ARGON2_TIME_COST,
+    memory_cost=auth_settings.ARGON2_MEMORY_COST,
+    parallelism=auth_settings.ARGON2_PARALLELISM,
+    type=Type.ID,
+)
+logger.debug("Argon2id PasswordHasher initialized.")
+
+# Argon2 is CPU-bound; hashing on the event loop would stall every other request.
+# Module-level pool so worker processes are spawned once and reused.
+# 'forkserver' children start from a clean single-threaded server process, so they don't
+# inherit the event loop's threads, the listening socket, or open DB/Redis connections.
+# Sized per uvicorn worker so all workers together use about one hashing process per core.
+_pwd_pool_workers = auth_settings.ARGON2_POOL_WORKERS or max(
+    1, (os.cpu_count() or 1) // max(1, auth_settings.WEB_CONCURRENCY)
+)
+_pwd_mp_context = multiprocessing.get_context("forkserver")
+
+def _new_pwd_pool() -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=_pwd_pool_workers, mp_context=_pwd_mp_context)
+
+_pwd_pool = _new_pwd_pool()
+
+# Hash verified against when a login email is unknown, so both paths cost one Argon2 verify.
+# Generated at startup by warm_password_pool() with the current cost parameters.
+_dummy_hash: Optional[str] = None
 
 # Defines the scheme for expecting an OAuth2 Bearer token in the header
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/login")
@@ -32,15 +80,73 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/v1/auth/login")
 # --- Password Utilities ---
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifies a plain password against its hash."""
-    logger.debug("Attempting password verification.")
-    return pwd_context.verify(plain_password, hashed_password)
+    try:
+        return ph.verify(hashed_password, plain_password)
+    except VerifyMismatchError:
+        return False
+    except InvalidHashError:
+        logger.error("Stored password hash is not a valid Argon2 hash.")
+        return False
 
 def get_password_hash(password: str) -> str:
-    """Hashes a password using Argon2., truncating if necessary."""
-    # bcrypt has a 72 byte limit on input password length.
     """Hashes a password using Argon2."""
-    logger.debug("Password Encrytion Successfull.")
-    return pwd_context.hash(password)
+    return ph.hash(password)
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Checks whether a stored hash was made with older cost parameters. Parses only, no hashing."""
+    try:
+        return ph.check_needs_rehash(hashed_password)
+    except InvalidHashError:
+        return False
+
+async def _run_in_pwd_pool(func, *args):
+    """
+    Runs func on the hashing process pool. If a worker died (e.g. OOM-killed), the pool is
+    broken for good, so it is replaced and the call retried once instead of failing forever.
+    """
+    global _pwd_pool
+    loop = asyncio.get_running_loop()
+    pool = _pwd_pool
+    try:
+        return await loop.run_in_executor(pool, func, *args)
+    except BrokenProcessPool:
+        # Concurrent callers may all see the same broken pool; only the first replaces it
+        if _pwd_pool is pool:
+            logger.error("Password hashing process pool is broken (worker died). Rebuilding pool.")
+            pool.shutdown(wait=False, cancel_futures=True)
+            _pwd_pool = _new_pwd_pool()
+        return await loop.run_in_executor(_pwd_pool, func, *args)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Runs verify_password on the hashing process pool without blocking the event loop."""
+    return await _run_in_pwd_pool(verify_password, plain_password, hashed_password)
+
+async def hash_password_async(password: str) -> str:
+    """Runs get_password_hash on the hashing process pool without blocking the event loop."""
+    return await _run_in_pwd_pool(get_password_hash, password)
+
+async def verify_dummy_password(plain_password: str) -> None:
+    """Burns one Argon2 verify for unknown users to keep login timing uniform."""
+    global _dummy_hash
+    if _dummy_hash is None:
+        _dummy_hash = await hash_password_async("dummy-password")
+    await verify_password_async(plain_password, _dummy_hash)
+
+async def warm_password_pool() -> None:
+    """
+    Spawns every hashing worker and runs one Argon2 hash in each, so the first real
+    logins don't pay process start-up or allocator cold-start cost. Also sets the dummy hash.
+    """
+    global _dummy_hash
+    # Concurrent submissions make the pool start all of its workers
+    hashes = await asyncio.gather(*(hash_password_async("warmup") for _ in range(_pwd_pool_workers)))
+    _dummy_hash = hashes[0]
+    logger.info(f"Password hashing pool warmed ({_pwd_pool_workers} workers).")
+
+def shutdown_password_pool() -> None:
+    """Stops the hashing worker processes. Called from the app lifespan on shutdown."""
+    _pwd_pool.shutdown(wait=True)
+    logger.info("Password hashing process pool shut down.")
 
 # --- JWT Token Utilities ---
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -49,16 +155,18 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     Includes exception handling for token generation failure.
     """
     to_encode = data.copy()
+    # 'exp' is encoded as an integer epoch timestamp, so skip datetime arithmetic entirely
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = int(time.time()) + int(expires_delta.total_seconds())
     else:
-        expire = datetime.utcnow() + timedelta(minutes=auth_settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+        expire = int(time.time()) + _access_token_expire_seconds
+    to_encode["exp"] = expire
     
     # CRITICAL EXCEPTION HANDLING for token encoding
     try:
-        encoded_jwt = jwt.encode(to_encode, auth_settings.SECRET_KEY, algorithm=auth_settings.ALGORITHM)
-        logger.debug(f"JWT token successfully created. Expires: {expire}")
+        encoded_jwt = jwt.encode(to_encode, JWT_SIGNING_KEY, algorithm=JWT_ALGORITHM)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("JWT token successfully created. Expires: %s", expire)
         return encoded_jwt
     except Exception as e:
         logger.critical(f"FATAL: Error creating JWT token. Check SECRET_KEY or ALGORITHM settings. Error: {e}")
@@ -67,39 +175,3 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Server security mechanism failed. Cannot issue token."
         )
-
-# --- Dependency for Protected Routes (Authentication) ---
-async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
-    """
-    Validates a JWT and extracts the user's identifier ('sub').
-    This function is run before protected endpoint logic.
-    """
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Authentication failed. Token is invalid or expired.",
-        headers={"WWW-Authenticate": "Bearer"},
-    )
-    
-    # EXCEPTION HANDLING for token decoding and validation
-    try:
-        # Decode the token using the application's secret key
-        payload = jwt.decode(token, auth_settings.SECRET_KEY, algorithms=[auth_settings.ALGORITHM])
-        email: str = payload.get("sub")
-        
-        # Check if the required claim ('sub') is present
-        if email is None:
-            logger.warning("Token decoded successfully, but 'sub' (email) claim was missing.")
-            raise credentials_exception
-            
-    except JWTError as e:
-        # Handle specific JWT errors (e.g., signature mismatch, token expired)
-        logger.warning(f"JWT Validation Failed. Type: {e.__class__.__name__}, Detail: {e}")
-        raise credentials_exception
-    except Exception as e:
-        # Handle unexpected errors during token processing
-        logger.error(f"Unexpected error during token processing: {e}")
-        raise credentials_exception
-    
-    logger.info(f"Token successfully validated for user: {email}")
-    # Returns the email, which can be used by the endpoint to fetch user data
-    return {"email": email} 
@@ -0,0 +1,66 @@
+import hashlib
+import json
+import logging
+import time
+from typing import Optional
+
+import redis.asyncio as redis
+from pydantic_settings import BaseSettings
+
+# Set up logging for the cache module
+logger = logging.getLogger("cache")
+logger.setLevel(logging.INFO)
+
+# --- 1. Settings Configuration ---
+class CacheSettings(BaseSettings):
+    # Reads environment variable REDIS_URL from docker-compose
+    REDIS_URL: str = "redis://redis:6379/0"
+    # Upper bound on how long a validated token -> user mapping may be served from cache
+    AUTH_CACHE_TTL_SECONDS: int = 10
+    # Short socket timeouts so a hung or unreachable Redis becomes a fast cache miss
+    REDIS_CONNECT_TIMEOUT_SECONDS: float = 0.05
+    REDIS_SOCKET_TIMEOUT_SECONDS: float = 0.05
+
+cache_settings = CacheSettings()
+logger.info(f"Cache settings loaded. URL: {cache_settings.REDIS_URL.split('@')[-1]}") # Log without credentials
+
+# --- 2. Redis Client Setup ---
+# The client holds a lazy connection pool; no connection is made until first use.
+redis_client = redis.from_url(
+    cache_settings.REDIS_URL,
+    decode_responses=True,
+    socket_connect_timeout=cache_settings.REDIS_CONNECT_TIMEOUT_SECONDS,
+    socket_timeout=cache_settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+)
+
+def _token_key(token: str) -> str:
+    """Builds the cache key for a token. Raw tokens are never stored in Redis."""
+    return "auth:token:" + hashlib.sha256(token.encode()).hexdigest()
+
+# --- 3. Token -> User Cache ---
+# Cache failures are logged and treated as a miss so authentication keeps working without Redis.
+async def get_cached_user(token: str) -> Optional[dict]:
+    """Returns the cached {'email', 'id'} mapping for a validated token, or None on miss."""
+    try:
+        cached = await redis_client.get(_token_key(token))
+    except redis.RedisError as e:
+        logger.warning(f"Auth cache lookup failed, falling back to full validation. Detail: {e}")
+        return None
+    return json.loads(cached) if cached else None
+
+async def set_cached_user(token: str, user: dict, token_exp: Optional[int]) -> None:
+    """Caches a validated token -> user mapping, never beyond the token's own expiry."""
+    ttl = cache_settings.AUTH_CACHE_TTL_SECONDS
+    if token_exp is not None:
+        ttl = min(int(token_exp) - int(time.time()), ttl)
+    if ttl <= 0:
+        return
+    try:
+        await redis_client.set(_token_key(token), json.dumps(user), ex=ttl)
+    except redis.RedisError as e:
+        logger.warning(f"Auth cache write failed. Detail: {e}")
+
+async def close_cache() -> None:
+    """Closes the Redis connection pool. Called from the app lifespan on shutdown."""
+    await redis_client.aclose()
+    logger.info("Redis connection pool closed.")
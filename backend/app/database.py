@@ -1,24 +1,60 @@
 import logging
+from typing import Optional
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import DeclarativeBase
 from pydantic_settings import BaseSettings
 
 # Set up logging for the database module
 logger = logging.getLogger("database")
-logger.setLevel(logging.DEBUG) 
+logger.setLevel(logging.INFO) 
 
 # --- 1. Settings Configuration ---
 class Settings(BaseSettings):
     # Reads environment variable DATABASE_URL from docker-compose
     DATABASE_URL: str = "postgresql+asyncpg://user:password@db:5432/docu_sage_db"
+    # Number of uvicorn worker processes; each one builds its own engine and pool
+    WEB_CONCURRENCY: int = 1
+    # Total connections (pool + overflow) allowed across all workers. The default of 60 stays
+    # under the 97 non-superuser slots of Postgres's default max_connections=100.
+    DB_CONNECTION_BUDGET: int = 60
+    # Per-worker connection pool sizing. When unset, DB_CONNECTION_BUDGET is split across
+    # WEB_CONCURRENCY workers (1/3 pooled, 2/3 overflow). Explicit values bypass the budget.
+    DB_POOL_SIZE: Optional[int] = None
+    DB_MAX_OVERFLOW: Optional[int] = None
+    DB_POOL_RECYCLE_SECONDS: int = 1800
     
 settings = Settings()
 logger.info(f"Database settings loaded. URL: {settings.DATABASE_URL.split('@')[-1]}") # Log without credentials
 
+_web_concurrency = max(1, settings.WEB_CONCURRENCY)
+# Every worker needs at least one connection, so the budget can only hold up to one worker per connection
+_per_worker_budget = max(1, settings.DB_CONNECTION_BUDGET // _web_concurrency)
+if _web_concurrency > settings.DB_CONNECTION_BUDGET:
+    logger.warning(
+        f"WEB_CONCURRENCY={_web_concurrency} exceeds DB_CONNECTION_BUDGET={settings.DB_CONNECTION_BUDGET}; "
+        f"workers may open up to {_web_concurrency} connections in total."
+    )
+db_pool_size = settings.DB_POOL_SIZE if settings.DB_POOL_SIZE is not None else max(1, _per_worker_budget // 3)
+db_max_overflow = settings.DB_MAX_OVERFLOW if settings.DB_MAX_OVERFLOW is not None else _per_worker_budget - db_pool_size
+logger.info(f"DB pool per worker: pool_size={db_pool_size}, max_overflow={db_max_overflow}")
+
 # --- 2. Database Engine and Session Setup ---
 try:
     # Use 'asyncpg' driver for asynchronous operations
-    engine = create_async_engine(settings.DATABASE_URL, echo=False)
+    engine = create_async_engine(
+        settings.DATABASE_URL,
+        echo=False,
+        pool_size=db_pool_size,
+        max_overflow=db_max_overflow,
+        pool_pre_ping=True, # Discard connections dropped by Postgres before handing them out
+        pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+        connect_args={
+            # JIT compilation only adds planning overhead for our short OLTP queries
+            "server_settings": {"jit": "off"},
+            # Reuse parsed statements for hot queries such as the users-by-email lookup
+            "prepared_statement_cache_size": 512,
+        },
+    )
     AsyncSessionLocal = async_sessionmaker(
         engine, 
         class_=AsyncSession, 
@@ -35,20 +71,10 @@ class Base(DeclarativeBase):
 
 # Dependency for protected routes
 async def get_db():
-    """Provides an asynchronous database session, handles closure, and logs errors."""
-    session = AsyncSessionLocal()
-    logger.debug("New DB session acquired.")
-    try:
+    """Provides an asynchronous database session; the context manager closes it (rolling back on error)."""
+    async with AsyncSessionLocal() as session:
         yield session
-    except Exception as e:
-        logger.error(f"Error during database operation within session: {e}")
-        # Re-raise the exception after logging to trigger FastAPI's error handling
-        raise
-    finally:
-        # CRITICAL: Ensures session is always closed, regardless of success or failure.
-        await session.close()
-        logger.debug("DB session closed.")
-            
+
 # Function to create tables
 async def init_db():
     """Attempts to connect to DB and create tables, handling connection errors."""
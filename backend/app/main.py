@@ -1,21 +1,55 @@
 import logging
 import sys
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import HTMLResponse, ORJSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
 from contextlib import asynccontextmanager
+from pydantic_settings import BaseSettings
 from .database import init_db
+from .auth_utils import shutdown_password_pool, warm_password_pool
+from .cache import close_cache
 from .routers import auth, files # IMPORT NEW ROUTER , Added files
 
 # --- Global Logging Configuration ---
-# Configure the root logger to output debug messages and format them nicely.
+# Configure the root logger to output operational messages and format them nicely.
 logging.basicConfig(
-    level=logging.DEBUG, # Set global level to DEBUG to capture all module logs
+    level=logging.INFO, # Use DEBUG only when diagnosing; per-request debug logging is costly
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     stream=sys.stdout # Ensure logs go to standard output (captured by Docker)
 )
 # Get a specific logger for this module
 logger = logging.getLogger("main")
 
+# --- App Configuration: Reads from environment (docker-compose) ---
+class AppSettings(BaseSettings):
+    # Enables the ?profile=1 request profiler. Must stay off in production.
+    PROFILE: bool = False
+
+app_settings = AppSettings()
+
+# --- Profiling Middleware ---
+class ProfileMiddleware(BaseHTTPMiddleware):
+    """
+    Profiles a single request with pyinstrument when '?profile=1' is passed,
+    returning the HTML report instead of the endpoint's response.
+    Only registered when PROFILE is enabled.
+    """
+    async def dispatch(self, request: Request, call_next):
+        if request.query_params.get("profile") != "1":
+            return await call_next(request)
+
+        from pyinstrument import Profiler # Imported lazily; only needed when profiling is enabled
+        profiler = Profiler(interval=0.001, async_mode="enabled")
+        profiler.start()
+        response = await call_next(request)
+        # Drain the body so the endpoint runs to completion, including its BackgroundTasks
+        async for _ in response.body_iterator:
+            pass
+        profiler.stop()
+        logger.info(f"Profiled request: {request.method} {request.url.path}")
+        return HTMLResponse(profiler.output_html())
+
 # --- Startup/Shutdown Context Manager ---
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -32,19 +66,33 @@ async def lifespan(app: FastAPI):
         # If DB connection fails, we log critically but allow FastAPI to start for dev/debugging
         logger.critical(f"CRITICAL ERROR: Failed to initialize database during startup. Application may be non-functional. Detail: {e}")
 
+    # Pre-spawn and warm the Argon2 workers so the first logins don't see a latency spike
+    try:
+        await warm_password_pool()
+    except Exception as e:
+        logger.error(f"Failed to warm password hashing pool; hashing will start lazily. Detail: {e}")
+
     yield
     
     # Cleanup logic (if any is needed on shutdown)
     logger.info("Application lifespan end: Shutting down.")
+    shutdown_password_pool()
+    await close_cache()
 
 # --- FastAPI App Instance ---
 app = FastAPI(
     title="DocuSage AI Platform (v1.0 - Auth Ready)",
     description="Backend service with full authentication and robust logging implemented.",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse, # Rust-backed JSON serialization for every endpoint
 )
 
+# --- Profiling (development only) ---
+if app_settings.PROFILE:
+    app.add_middleware(ProfileMiddleware)
+    logger.warning("Request profiling is ENABLED (?profile=1). Do not run this in production.")
+
 # --- START: CORS Configuration to allow frontend requests ---
 origins = [
     "http://localhost",
@@ -56,8 +104,10 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    # Explicit lists avoid wildcard handling on every request
+    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    allow_headers=["Authorization", "Content-Type"],
+    max_age=86400, # Let browsers cache preflight responses for 24h
 )
 # --- END: CORS Configuration ---
 
@@ -5,7 +5,7 @@ from .database import Base
 
 # Set up logging for this module (primarily for debugging model loading if needed)
 logger = logging.getLogger("models")
-logger.setLevel(logging.DEBUG) 
+logger.setLevel(logging.INFO) 
 
 # --- SQLAlchemy ORM Models (Table Definitions) ---
 
@@ -20,5 +20,6 @@ class User(Base):
     def __repr__(self) -> str:
         """Helper for debugging to show object state."""
         # Logs when a User object is represented, useful for tracking loaded objects
-        logger.debug(f"Representing User object with email: {self.email!r}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Representing User object with email: %r", self.email)
         return f"User(id={self.id!r}, email={self.email!r})"
@@ -1,16 +1,17 @@
 import logging
-from fastapi import APIRouter, Depends, HTTPException, status
+import jwt
+from jwt import PyJWTError
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import exists, insert, update
 from sqlalchemy.future import select
 from sqlalchemy.exc import SQLAlchemyError
-# The core JWT imports are now handled via auth_utils functions, 
-# but we need JWTError for the custom get_current_user check.
-from jose import JWTError 
 
 # Local imports
 from .. import schemas, models, auth_utils
-from ..database import get_db
-from ..auth_utils import get_password_hash, verify_password, create_access_token, get_current_user
+from ..cache import get_cached_user, set_cached_user
+from ..database import AsyncSessionLocal, get_db
+from ..auth_utils import hash_password_async, verify_password_async, verify_dummy_password, password_needs_rehash, create_access_token
 
 # Set up a dedicated logger for the Auth Router
 # FIX APPLIED: Prefix removed to prevent double-prefixing with main.py
@@ -19,8 +20,8 @@ logger = logging.getLogger("auth_router")
 logger.setLevel(logging.INFO) # Use INFO for operational logs, DEBUG for internal flows
 
 # --- Security Dependency ---
-# NOTE: This implementation of get_current_user is custom and relies on the user object,
-# whereas the one in auth_utils.py is for token validation only.
+# NOTE: get_current_user decodes the token itself and resolves the user in one query;
+# it is the single token validator for protected routes.
 async def get_current_user(token: str = Depends(auth_utils.oauth2_scheme), db: AsyncSession = Depends(get_db)):
     """
     Dependency function to verify JWT token and retrieve the user object.
@@ -33,31 +34,32 @@ async def get_current_user(token: str = Depends(auth_utils.oauth2_scheme), db: A
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    validated_email = None
+    # 0. Serve recently validated tokens from cache (skips JWT decode and DB lookup)
+    cached_user = await get_cached_user(token)
+    if cached_user is not None:
+        return cached_user
 
-    # 1. Use the token validation logic from auth_utils
+    # 1. Decode the token inline (signature and expiration check)
     try:
-        # get_current_user in auth_utils returns {'email': email} if token is valid
-        # This part handles decoding and expiration check
-        token_data_dict = await auth_utils.get_current_user(token) 
-        validated_email = token_data_dict.get("email")
-        
-        if validated_email is None:
-            logger.warning("Token valid but 'email' (sub) claim missing.")
-            raise credentials_exception
-            
-    except HTTPException:
-        # Re-raise the 401 exception if validation fails in auth_utils
-        raise
+        payload = jwt.decode(token, auth_utils.JWT_SIGNING_KEY, algorithms=auth_utils.JWT_ALGORITHMS)
+        validated_email = payload.get("sub")
+        token_exp = payload.get("exp")
+    except PyJWTError as e:
+        logger.warning(f"JWT Validation Failed. Type: {e.__class__.__name__}, Detail: {e}")
+        raise credentials_exception
     except Exception as e:
         logger.error(f"Unexpected error during token processing: {e}")
         raise credentials_exception
 
-    # 4. Fetch the user from the database using the extracted email string
+    if validated_email is None:
+        logger.warning("Token valid but 'email' (sub) claim missing.")
+        raise credentials_exception
+
+    # 2. Fetch only the id/email columns in a single round-trip (no ORM object hydration)
     try:
-        stmt = select(models.User).where(models.User.email == validated_email) # Use the validated_email string
+        stmt = select(models.User.id, models.User.email).where(models.User.email == validated_email)
         result = await db.execute(stmt)
-        user = result.scalar_one_or_none()
+        user = result.first()
     except SQLAlchemyError as e:
         logger.error(f"DB ERROR: Query failed during user lookup for validated token. Detail: {e}")
         raise HTTPException(
@@ -69,8 +71,27 @@ async def get_current_user(token: str = Depends(auth_utils.oauth2_scheme), db: A
         logger.warning(f"Authenticated user not found in DB: {validated_email}")
         raise credentials_exception
     
-    # 5. Return the full user object (in a dict format for dependency use)
-    return {'email': user.email, 'id': user.id}
+    # 3. Return the user (in a dict format for dependency use)
+    current_user = {'email': user.email, 'id': user.id}
+    await set_cached_user(token, current_user, token_exp)
+    return current_user
+
+# --- Background Password Rehash ---
+async def rehash_password(user_id: int, plain_password: str):
+    """
+    Upgrades a stored hash to the current Argon2 parameters after a successful login.
+    Runs as a background task, so it uses its own session rather than the request's.
+    """
+    new_hash = await hash_password_async(plain_password)
+    try:
+        async with AsyncSessionLocal() as session:
+            await session.execute(
+                update(models.User).where(models.User.id == user_id).values(password_hash=new_hash)
+            )
+            await session.commit()
+        logger.info(f"Password hash upgraded to current parameters for user ID {user_id}.")
+    except SQLAlchemyError as e:
+        logger.error(f"DB ERROR: Failed to store rehashed password for user ID {user_id}. Detail: {e}")
 
 @router.post("/register", response_model=schemas.Token)
 async def register_user(user_data: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
@@ -83,9 +104,9 @@ async def register_user(user_data: schemas.UserCreate, db: AsyncSession = Depend
     
     # 1. Check if user already exists
     try:
-        stmt = select(models.User).where(models.User.email == user_data.email)
-        result = await db.execute(stmt)
-        existing_user = result.scalar_one_or_none()
+        # EXISTS lets Postgres answer from the email index without returning the row
+        stmt = select(exists().where(models.User.email == user_data.email))
+        existing_user = await db.scalar(stmt)
     except SQLAlchemyError as e:
         # Log specific DB execution errors
         logger.error(f"DB ERROR: Query failed during registration check for {user_data.email}. Detail: {e.__class__.__name__} - {e}")
@@ -98,16 +119,21 @@ async def register_user(user_data: schemas.UserCreate, db: AsyncSession = Depend
         logger.warning(f"REGISTRATION FAILED: Email already registered: {user_data.email}")
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
 
-    # 2. Hash password and create user object
-    hashed_password = get_password_hash(user_data.password)
-    new_user = models.User(email=user_data.email, password_hash=hashed_password)
+    # 2. Hash password
+    hashed_password = await hash_password_async(user_data.password)
     
-    # 3. Commit user to database (CRITICAL SECTION)
+    # 3. Insert user and commit (CRITICAL SECTION)
+    # INSERT ... RETURNING yields the new id in the same round-trip, so no refresh SELECT is needed
     try:
-        db.add(new_user)
+        stmt = (
+            insert(models.User)
+            .values(email=user_data.email, password_hash=hashed_password)
+            .returning(models.User.id)
+        )
+        result = await db.execute(stmt)
+        new_user_id = result.scalar_one()
         await db.commit()
-        await db.refresh(new_user)
-        logger.info(f"REGISTRATION SUCCESS: User created. ID: {new_user.id}, Email: {new_user.email}")
+        logger.info(f"REGISTRATION SUCCESS: User created. ID: {new_user_id}, Email: {user_data.email}")
     except SQLAlchemyError as e:
         # Ensure transaction is rolled back and log a critical failure
         await db.rollback()
@@ -118,11 +144,11 @@ async def register_user(user_data: schemas.UserCreate, db: AsyncSession = Depend
         )
 
     # 4. Create and return JWT
-    access_token = create_access_token(data={"sub": new_user.email})
+    access_token = create_access_token(data={"sub": user_data.email})
     return schemas.Token(access_token=access_token)
 
 @router.post("/login", response_model=schemas.Token)
-async def login_for_access_token(user_data: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
+async def login_for_access_token(user_data: schemas.UserCreate, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db)):
     """
     Handles user login, verifies credentials, and issues a JWT.
     """
@@ -131,9 +157,10 @@ async def login_for_access_token(user_data: schemas.UserCreate, db: AsyncSession
 
     # 1. Find user by email
     try:
-        stmt = select(models.User).where(models.User.email == user_data.email)
+        # Project only the columns login needs instead of hydrating a full ORM object
+        stmt = select(models.User.id, models.User.email, models.User.password_hash).where(models.User.email == user_data.email)
         result = await db.execute(stmt)
-        user = result.scalar_one_or_none()
+        user = result.first()
     except SQLAlchemyError as e:
         logger.error(f"DB ERROR: Query failed during login attempt for {user_data.email}. Detail: {e}")
         raise HTTPException(
@@ -143,6 +170,8 @@ async def login_for_access_token(user_data: schemas.UserCreate, db: AsyncSession
 
     # 2. Verify existence
     if not user:
+        # Still run a full Argon2 verify so unknown emails can't be told apart by response time
+        await verify_dummy_password(user_data.password)
         logger.warning(f"LOGIN FAILED: User not found for email: {user_data.email}")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -151,13 +180,17 @@ async def login_for_access_token(user_data: schemas.UserCreate, db: AsyncSession
         )
         
     # 3. Verify password
-    if not verify_password(user_data.password, user.password_hash):
+    if not await verify_password_async(user_data.password, user.password_hash):
         logger.warning(f"LOGIN FAILED: Password mismatch for user ID {user.id}.")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+    # 3b. Lazily upgrade hashes made with outdated parameters, off the response path
+    if password_needs_rehash(user.password_hash):
+        background_tasks.add_task(rehash_password, user.id, user_data.password)
     
     # 4. Create and return JWT
     access_token = create_access_token(data={"sub": user.email})
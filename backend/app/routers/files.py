@@ -1,11 +1,15 @@
+import asyncio
 import logging
 import os
-from pathlib import Path
+import re
+from pathlib import Path, PurePosixPath
+from typing import Optional
+
+import aiofiles
 
 from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status
 
 from ..routers.auth import get_current_user
-from .. import models
 
 # --- Global Logging Configuration ---
 logger = logging.getLogger("files_router")
@@ -15,10 +19,64 @@ logger = logging.getLogger("files_router")
 # We'll map this to a Docker Volume later for persistence.
 UPLOAD_DIR = "user_uploads"
 
+# Uploads are streamed to disk in fixed-size chunks so memory use stays O(chunk), not O(file)
+UPLOAD_CHUNK_SIZE = 1 << 20 # 1 MiB
+
+# Accepted upload MIME types (PDF, TXT, DOCX); frozenset gives O(1) membership checks
+ALLOWED_TYPES = frozenset({
+    "application/pdf",
+    "text/plain",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+})
+
+# Any character outside [A-Za-z0-9_.-] is replaced when sanitizing filenames (ASCII-only \w)
+_UNSAFE_FILENAME_CHARS = re.compile(r"[^\w.\-]", re.ASCII)
+
 # Create the upload directory if it doesn't exist
 Path(UPLOAD_DIR).mkdir(exist_ok=True)
 logger.info(f"File upload directory created/verified: {UPLOAD_DIR}")
 
+# --- Upload Copy Helpers ---
+def _spilled_fileno(upload: UploadFile) -> Optional[int]:
+    """
+    Returns the OS file descriptor backing an upload if its SpooledTemporaryFile has
+    already rolled over to disk, else None. Never forces an in-memory upload to disk.
+    """
+    spooled = upload.file
+    if not getattr(spooled, "_rolled", False):
+        return None
+    try:
+        return spooled.fileno()
+    except (AttributeError, OSError):
+        return None
+
+def _sendfile_to_path(src_fd: int, dst_path: Path) -> None:
+    """Copies the whole of src_fd into dst_path in-kernel with os.sendfile (no userspace buffers)."""
+    size = os.fstat(src_fd).st_size
+    offset = 0
+    with open(dst_path, "wb") as dst:
+        dst_fd = dst.fileno()
+        while offset < size:
+            sent = os.sendfile(dst_fd, src_fd, offset, size - offset)
+            if sent == 0:
+                break
+            offset += sent
+
+async def _save_upload(upload: UploadFile, dst_path: Path) -> None:
+    """
+    Saves an upload to dst_path. Spilled-to-disk uploads are copied with os.sendfile
+    in a worker thread; in-memory uploads are streamed in chunks with aiofiles.
+    """
+    src_fd = _spilled_fileno(upload) if hasattr(os, "sendfile") else None
+    if src_fd is not None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, _sendfile_to_path, src_fd, dst_path)
+        return
+
+    async with aiofiles.open(dst_path, "wb") as out:
+        while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+            await out.write(chunk)
+
 # --- Router Setup ---
 router = APIRouter(
     prefix="/files",
@@ -30,7 +88,7 @@ router = APIRouter(
 @router.post("/upload")
 async def upload_file(
     file: UploadFile = File(...),
-    current_user: models.User = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user)
 ):
     """
     Accepts a single file upload from an authenticated user.
@@ -38,8 +96,8 @@ async def upload_file(
     """
     
     # 1. Validation Check: Ensure file type is acceptable
-    if file.content_type not in ["application/pdf", "text/plain", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"]:
-        logger.warning(f"Upload rejected: Invalid file type {file.content_type} from user {current_user.email}")
+    if file.content_type not in ALLOWED_TYPES:
+        logger.warning(f"Upload rejected: Invalid file type {file.content_type} from user {current_user['email']}")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"Unsupported file type: {file.content_type}. Only PDF, TXT, or DOCX are allowed."
@@ -49,21 +107,25 @@ async def upload_file(
     # We create a nested directory structure for security and organization:
     # UPLOAD_DIR / user_id / filename
     
-    user_dir = Path(UPLOAD_DIR) / str(current_user.id)
+    user_dir = Path(UPLOAD_DIR) / str(current_user['id'])
     user_dir.mkdir(exist_ok=True) # Ensure the user's personal folder exists
     
-    # Sanitize filename to prevent directory traversal attacks (optional but good practice)
-    safe_filename = file.filename.replace("/", "_").replace("\\", "_")
+    # Sanitize filename to prevent directory traversal attacks:
+    # keep only the basename, then replace anything outside [A-Za-z0-9_.-]
+    safe_filename = _UNSAFE_FILENAME_CHARS.sub("_", PurePosixPath(file.filename or "").name)
+    if safe_filename in ("", ".", ".."):
+        logger.warning(f"Upload rejected: Invalid filename {file.filename!r} from user {current_user['email']}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid file name."
+        )
     file_path = user_dir / safe_filename
     
-    logger.info(f"Receiving file '{file.filename}' for user {current_user.email} (ID: {current_user.id}).")
+    logger.info(f"Receiving file '{file.filename}' for user {current_user['email']} (ID: {current_user['id']}).")
 
-    # 3. Save the file synchronously to disk
+    # 3. Copy the file to disk without blocking the event loop
     try:
-        # FastAPI's UploadFile reads the file in chunks and saves it
-        contents = await file.read()
-        with open(file_path, "wb") as f:
-            f.write(contents)
+        await _save_upload(file, file_path)
         
         logger.info(f"File saved successfully to: {file_path}")
 
@@ -72,11 +134,11 @@ async def upload_file(
             "message": "File uploaded successfully",
             "filename": safe_filename,
             "path": str(file_path),
-            "user_id": current_user.id
+            "user_id": current_user['id']
         }
 
     except Exception as e:
-        logger.error(f"Error saving file for user {current_user.email}: {e}")
+        logger.error(f"Error saving file for user {current_user['email']}: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Could not save file on the server."